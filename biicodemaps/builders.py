@@ -83,10 +83,18 @@ needed to cover all needed resulting paths.
 
 '''
 
+import re
 from biicodemaps.error import BiiCodeMapsError
 from biicodemaps.model import Map
 
 
+FILE_BUFFER_SIZE = 1 << 20
+'''Buffer size used when reading input files (bytes).'''
+
+_RET_SYMBOL = re.compile('[^ ]')
+'''Matches RET positions other than plain cities (blanks).'''
+
+
 class BCMStreamMapBuilder(object):
     '''A builder that constructs a map from a BCM format stream.'''
     def __init__(self, stream):
@@ -101,12 +109,14 @@ class BCMStreamMapBuilder(object):
             line = line.strip()
             if not line or line.startswith('#'):
                 continue
-            if line.lower().startswith('[cities]'):
-                state = 'reading_cities'
-                continue
-            if line.lower().startswith('[roads]'):
-                state = 'reading_roads'
-                continue
+            if line.startswith('['):
+                header = line.lower()
+                if header.startswith('[cities]'):
+                    state = 'reading_cities'
+                    continue
+                if header.startswith('[roads]'):
+                    state = 'reading_roads'
+                    continue
             if state == 'reading_cities':
                 items = line.split(',')
                 if len(items) != 3:
@@ -138,7 +148,7 @@ class BCMFileMapBuilder(BCMStreamMapBuilder):
         self.input_type = 'file'
 
     def build(self):
-        with open(self.file_name) as f:
+        with open(self.file_name, 'r', FILE_BUFFER_SIZE) as f:
             self.stream = f
             return super(BCMFileMapBuilder, self).build()
 
@@ -155,6 +165,11 @@ class BCMStringMapBuilder(BCMStreamMapBuilder):
         return super(BCMStringMapBuilder, self).build()
 
 
+def _reading_order(coords):
+    '''Sort key to put reading coordinates in row by row order.'''
+    return coords[1], coords[0]
+
+
 class RETStreamMapBuilder(object):
     '''A builder that constructs a reticle from a RET format stream.'''
     def __init__(self, stream, diagonal=True):
@@ -166,30 +181,40 @@ class RETStreamMapBuilder(object):
     def build(self):
         rows, columns, origin, missing, start, end, expected = self._scan()
         map_ = Map()
+
+        # cities in previous and current row, None at missing positions
+        row_length = columns or 0  # columns is None for empty input
+        previous_row, current_row = [None] * row_length, [None] * row_length
         for y in range(rows):
             for x in range(columns):
-                if (x, y) not in missing:
-                    # create city
-                    self._create_city(map_, (x, y), origin)
+                if (x, y) in missing:
+                    current_row[x] = None
+                    continue
+
+                # create city
+                city = self._create_city(map_, (x, y), origin)
+                current_row[x] = city
+
+                # create roads to previously created cities
+                if x > 0 and current_row[x - 1]:
+                    self._create_road(map_, city, current_row[x - 1])
 
-                    # create roads to previously created cities
-                    if x > 0 and (x - 1, y) not in missing:
-                        self._create_road(map_, (x, y), (x - 1, y), origin)
+                if self.diagonal and x > 0 and previous_row[x - 1]:
+                    self._create_road(map_, city, previous_row[x - 1])
 
-                    if (self.diagonal and x > 0 and y > 0
-                            and (x - 1, y - 1) not in missing):
-                        self._create_road(map_, (x, y), (x - 1, y - 1), origin)
+                if previous_row[x]:
+                    self._create_road(map_, city, previous_row[x])
 
-                    if y > 0 and (x, y - 1) not in missing:
-                        self._create_road(map_, (x, y), (x, y - 1), origin)
+                if (self.diagonal and x < columns - 1
+                        and previous_row[x + 1]):
+                    self._create_road(map_, city, previous_row[x + 1])
 
-                    if (self.diagonal and x < columns - 1 and y > 0
-                            and (x + 1, y - 1) not in missing):
-                        self._create_road(map_, (x, y), (x + 1, y - 1), origin)
+            previous_row, current_row = current_row, previous_row
 
         return (map_, {'rows': rows, 'columns': columns, 'origin': origin,
                        'missing': [self._transform_coordinates(m, origin)
-                                   for m in missing],
+                                   for m in sorted(missing,
+                                                   key=_reading_order)],
                        'start': self._city_name(start, origin),
                        'end': self._city_name(end, origin),
                        'expected': [self._city_name(e, origin)
@@ -201,7 +226,7 @@ class RETStreamMapBuilder(object):
         recording info needed later.
         '''
         line_number, rows, columns = 0, 0, None
-        origin, start, end, missing, expected = None, None, None, [], []
+        origin, start, end, missing, expected = None, None, None, set(), []
         for line in self.stream:
             line_number += 1
 
@@ -221,9 +246,10 @@ class RETStreamMapBuilder(object):
                 raise BiiCodeMapsError('Wrong number of items at line %s.' %
                                        line_number)
 
-            for column, character in enumerate(line[1:-1]):
+            # blanks need no processing, so just visit the other symbols
+            for symbol in _RET_SYMBOL.finditer(line, 1, len(line) - 1):
                 origin, start, end = self._process_position(
-                    line_number, character, column, rows - 1,
+                    line_number, symbol.group(), symbol.start() - 1, rows - 1,
                     origin, start, end, missing, expected)
 
         if not origin:
@@ -245,9 +271,7 @@ class RETStreamMapBuilder(object):
     def _process_position(self, line_number, character, column, row,
                           origin, start, end, missing, expected):
         character = character.lower()
-        if character == ' ':
-            pass
-        elif character == '#':
+        if character == '#':
             if not start:
                 start = (column, row)
             else:
@@ -265,7 +289,7 @@ class RETStreamMapBuilder(object):
             else:
                 raise BiiCodeMapsError('More than one coordinates origin.')
         elif character == 'x':
-            missing.append((column, row))
+            missing.add((column, row))
         else:
             raise BiiCodeMapsError('Unknown character %s at line %s col %s' %
                                    (character, line_number, column + 1))
@@ -273,11 +297,12 @@ class RETStreamMapBuilder(object):
         return origin, start, end
 
     def _create_city(self, map_, coords, origin):
-        map_.create_city(self._city_name(coords, origin), *coords)
+        return map_.create_city(self._city_name(coords, origin), *coords)
 
-    def _create_road(self, map_, coords_1, coords_2, origin):
-        map_.create_road(self._city_name(coords_1, origin),
-                         self._city_name(coords_2, origin))
+    def _create_road(self, map_, city_1, city_2):
+        # each pair of adjacent cells is visited just once, so roads are
+        # always new, and between different cities
+        map_.create_road_between(city_1, city_2, check=False)
 
     def _transform_coordinates(self, coords, origin):
         '''
@@ -302,7 +327,7 @@ class RETFileMapBuilder(RETStreamMapBuilder):
         self.input_type = 'file'
 
     def build(self):
-        with open(self.file_name) as f:
+        with open(self.file_name, 'r', FILE_BUFFER_SIZE) as f:
             self.stream = f
             return super(RETFileMapBuilder, self).build()
 
@@ -15,6 +15,10 @@ two reasons:
       quickly export model data to external formats, without having to traverse
       cities to extract road info.
 
+Still, each city also keeps an adjacency list of (neighbour city, road length)
+pairs, derived from its roads as they are created. That is the view routing
+algorithms need, and it saves them from going through road objects.
+
 '''
 
 import math
@@ -28,8 +32,11 @@ class City(object):
         name
         x     Horizontal coordinate
         y     Vertical coordinate
+        id    Sequence number of the city within its map (0, 1, 2...)
     '''
-    def __init__(self, name, x, y):
+    __slots__ = ('name', 'x', 'y', 'id', '_roads', '_neighbours', '_adjacency')
+
+    def __init__(self, name, x, y, id_):
         '''City constructor.
 
         Users should not directly instantiate this class.
@@ -44,21 +51,28 @@ class City(object):
         self.name = name
         self.x = x
         self.y = y
+        self.id = id_
         self._roads = []
+        self._neighbours = set()
+        self._adjacency = []
 
     @property
     def roads(self):
         '''The roads this city is connected to.'''
         return self._roads
 
-    def _add_road(self, road):
+    @property
+    def adjacency(self):
+        '''(neighbour city, road length) pairs, one per road.'''
+        return self._adjacency
+
+    def _add_road(self, road, neighbour):
         self._roads.append(road)
+        self._neighbours.add(neighbour)
+        self._adjacency.append((neighbour, road.length))
 
     def has_road_to(self, city):
-        for road in self.roads:
-            if road.city_1 is city or road.city_2 is city:
-                return True
-        return False
+        return city in self._neighbours
 
 
 class Road(object):
@@ -69,23 +83,31 @@ class Road(object):
         city_2
         length
     '''
-    def __init__(self, city_1, city_2):
+    __slots__ = ('_city_1', '_city_2', '_length')
+
+    def __init__(self, city_1, city_2, check=True):
         '''Road constructor.
 
         Users should not directly instantiate this class.
         Use Map.create_road instead.
+
+        Passing check=False skips validation of cities being different and
+        not yet connected. Only for callers that guarantee it by other means.
         '''
-        if city_1 is city_2:
-            raise BiiCodeMapsError('Cities cannot be the same: %s' %
-                                   city_1.name)
+        if check:
+            if city_1 is city_2:
+                raise BiiCodeMapsError('Cities cannot be the same: %s' %
+                                       city_1.name)
 
-        if city_1.has_road_to(city_2):
-            raise BiiCodeMapsError('Road already exists')
+            if city_1.has_road_to(city_2):
+                raise BiiCodeMapsError('Road already exists')
 
         self._city_1 = city_1
         self._city_2 = city_2
-        city_1._add_road(self)
-        city_2._add_road(self)
+        # cities are fixed once the road exists, so length can be cached
+        self._length = math.hypot(city_1.x - city_2.x, city_1.y - city_2.y)
+        city_1._add_road(self, city_2)
+        city_2._add_road(self, city_1)
 
     @property
     def city_1(self):
@@ -97,15 +119,14 @@ class Road(object):
 
     @property
     def length(self):
-        return math.sqrt((self.city_1.x - self.city_2.x) ** 2 +
-                         (self.city_1.y - self.city_2.y) ** 2)
+        return self._length
 
     def other_end(self, city):
         '''Return the other end of this road that is not the passed city.'''
-        if city == self.city_1:
-            return self.city_2
-        if city == self.city_2:
-            return self.city_1
+        if city is self._city_1:
+            return self._city_2
+        if city is self._city_2:
+            return self._city_1
         raise BiiCodeMapsError('City %s does not belong to road' % city.name)
 
 
@@ -118,42 +139,84 @@ class Map(object):
         name   (optional)
         cities
         roads
+        max_road_length   Length of the longest road (0 if no roads)
     '''
+    __slots__ = ('name', '_cities', '_roads', '_max_road_length', '_csr')
+
     def __init__(self, name=None):
         self.name = name
         self._cities = {}
         self._roads = []
+        self._max_road_length = 0
+        self._csr = None
 
     @property
     def cities(self):
         return self._cities
 
     def city(self, name):
-        try:
-            return self._cities[name]
-        except KeyError:
-            return None
+        return self._cities.get(name)
 
     @property
     def roads(self):
         return self._roads
 
+    @property
+    def max_road_length(self):
+        return self._max_road_length
+
     def create_city(self, name, x, y):
         if name in self._cities:
             raise BiiCodeMapsError('Name already exists')
-        city = City(name, x, y)
+        city = City(name, x, y, len(self._cities))
         self._cities[name] = city
+        self._csr = None
         return city
 
     def create_road(self, city_1_name, city_2_name):
-        city_1 = self.city(city_1_name)
+        city_1 = self._cities.get(city_1_name)
         if not city_1:
             raise BiiCodeMapsError('Unknown city %s' % city_1_name)
 
-        city_2 = self.city(city_2_name)
+        city_2 = self._cities.get(city_2_name)
         if not city_2:
             raise BiiCodeMapsError('Unknown city %s' % city_2_name)
 
-        road = Road(city_1, city_2)
+        return self.create_road_between(city_1, city_2)
+
+    def create_road_between(self, city_1, city_2, check=True):
+        '''Like create_road, but taking cities of this map instead of names.
+
+        Useful when cities are at hand already, as it saves name lookups.
+        Bulk loaders that guarantee roads are valid by construction can also
+        pass check=False to skip validation (see Road constructor).
+        '''
+        road = Road(city_1, city_2, check)
         self._roads.append(road)
+        if road.length > self._max_road_length:
+            self._max_road_length = road.length
+        self._csr = None
         return road
+
+    def csr(self):
+        '''Return map connectivity in compressed sparse row (CSR) form.
+
+        This is, a (cities, offsets, neighbours, lengths) tuple of lists, where
+        cities are indexed by id, and the ids of the neighbours of city i,
+        as well as the lengths of the roads to them, are found at positions
+        offsets[i] to offsets[i + 1] - 1 of neighbours and lengths.
+
+        Result is computed once and reused until the map is modified.
+        '''
+        if self._csr is None:
+            cities = [None] * len(self._cities)
+            for city in self._cities.values():
+                cities[city.id] = city
+            offsets, neighbours, lengths = [0], [], []
+            for city in cities:
+                for neighbour, length in city.adjacency:
+                    neighbours.append(neighbour.id)
+                    lengths.append(length)
+                offsets.append(len(neighbours))
+            self._csr = cities, offsets, neighbours, lengths
+        return self._csr
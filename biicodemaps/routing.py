@@ -3,7 +3,7 @@ Routing services to calculate paths in maps.
 
 '''
 
-from math import sqrt
+from math import hypot
 from itertools import count
 from heapq import heappop, heappush
 from biicodemaps.error import BiiCodeMapsError
@@ -30,51 +30,74 @@ def _results(origin_city, destination_city, previous_city, cost):
 
     path, city = [], destination_city
     while True:
-        path.insert(0, city.name)
+        path.append(city.name)
         city = previous_city.get(city)
         if not city:
             break
+    path.reverse()
 
     return path, cost[destination_city]
 
 
+def _results_by_id(destination_city, previous_city, cost):
+    '''Like _results, but with cost and previous_city indexed by city id.'''
+    if cost[destination_city.id] == float('infinity'):
+        return [], cost[destination_city.id]
+
+    path, city = [], destination_city
+    while city:
+        path.append(city.name)
+        city = previous_city[city.id]
+    path.reverse()
+
+    return path, cost[destination_city.id]
+
+
 def shortest_path_dijkstra_original(map_,
                                     origin_city_name, destination_city_name):
     '''
     Find shortest path using Dijkstra's original algorithm.
 
+    Unvisited cities are kept in a heap of (cost, id, city) entries. Instead
+    of updating entries when costs improve, new ones are pushed, and stale
+    entries (those whose cost is no longer the city's cost) are skipped when
+    popped. Costs and previous cities are kept in lists indexed by city id.
+
     [http://en.wikipedia.org/wiki/Dijkstra%27s_algorithm]
 
     '''
     origin_city, destination_city = _safe_cities(map_, origin_city_name,
                                                  destination_city_name)
-    cities = map_.cities.values()
 
     # Initialize data structures
-    cost, previous_city, unvisited_cities = {}, {}, []
-    for city in cities:
-        cost[city] = 0 if city == origin_city else float('infinity')
-        previous_city[city] = None
-        unvisited_cities.append(city)
+    cities_count = len(map_.cities)
+    cost = [float('infinity')] * cities_count
+    previous_city = [None] * cities_count
+    cost[origin_city.id] = 0
+    # ids are unique, so entries never get to compare cities
+    unvisited_cities = [(0, origin_city.id, origin_city)]
 
     # Main loop
     while unvisited_cities:
         # get unvisited city which costs the least
-        city = min(unvisited_cities, key=lambda c: cost[c])
+        city_cost, city_id, city = heappop(unvisited_cities)
+        if city_cost != cost[city_id]:
+            continue  # stale entry, city has already been visited
 
-        unvisited_cities.remove(city)
         if (city == destination_city):
             break
 
         # update neighbours' costs
-        for road in city.roads:
-            neighbour_city = road.other_end(city)
-            neighbour_city_new_cost = cost[city] + road.length
-            if neighbour_city_new_cost < cost[neighbour_city]:
-                cost[neighbour_city] = neighbour_city_new_cost
-                previous_city[neighbour_city] = city
+        for neighbour_city, length in city.adjacency:
+            neighbour_city_new_cost = city_cost + length
+            neighbour_city_id = neighbour_city.id
+            if neighbour_city_new_cost < cost[neighbour_city_id]:
+                cost[neighbour_city_id] = neighbour_city_new_cost
+                previous_city[neighbour_city_id] = city
+                heappush(unvisited_cities, (neighbour_city_new_cost,
+                                            neighbour_city_id, neighbour_city))
 
-    return _results(origin_city, destination_city, previous_city, cost)
+    return _results_by_id(destination_city, previous_city, cost)
 
 
 def shortest_path_dijkstra_priority_queue(map_,
@@ -88,32 +111,227 @@ def shortest_path_dijkstra_priority_queue(map_,
     '''
     origin_city, destination_city = _safe_cities(map_, origin_city_name,
                                                  destination_city_name)
-    cities = map_.cities.values()
 
-    # Initialize data structures
+    # Initialize data structures (cities not yet in cost are unreached)
+    infinity = float('infinity')
     cost, previous_city, unvisited_cities = {}, {}, PriorityQueue()
-    for city in cities:
-        cost[city] = 0 if city == origin_city else float('infinity')
-        previous_city[city] = None
-        unvisited_cities.push(city, priority=cost[city])
+    cost[origin_city] = 0
+    unvisited_cities.push(origin_city, priority=cost[origin_city])
+    push = unvisited_cities.push
 
     # Main loop
     while unvisited_cities:
         # get unvisited city which costs the least
         city = unvisited_cities.pop()
+        city_cost = cost[city]
 
         if (city == destination_city):
             break
 
         # update neighbours' costs
-        for road in city.roads:
-            neighbour_city = road.other_end(city)
-            neighbour_city_new_cost = cost[city] + road.length
-            if neighbour_city_new_cost < cost[neighbour_city]:
+        for neighbour_city, length in city.adjacency:
+            neighbour_city_new_cost = city_cost + length
+            if neighbour_city_new_cost < cost.get(neighbour_city, infinity):
                 cost[neighbour_city] = neighbour_city_new_cost
                 previous_city[neighbour_city] = city
-                unvisited_cities.push(neighbour_city,
-                                      priority=cost[neighbour_city])
+                push(neighbour_city, priority=neighbour_city_new_cost)
+
+    return _results(origin_city, destination_city, previous_city, cost)
+
+
+def shortest_path_dijkstra_csr(map_,
+                               origin_city_name, destination_city_name):
+    '''
+    Find shortest path using Dijkstra's algorithm, working on city ids over
+    the compressed sparse row (CSR) form of the map.
+
+    Costs and previous cities are kept in plain lists indexed by city id, and
+    the heap holds (cost, id) tuples, so no city objects are touched until
+    the path is rebuilt. Stale heap entries are skipped instead of updated.
+
+    [http://en.wikipedia.org/wiki/Dijkstra%27s_algorithm]
+
+    '''
+    origin_city, destination_city = _safe_cities(map_, origin_city_name,
+                                                 destination_city_name)
+    cities, offsets, neighbours, lengths = map_.csr()
+    origin, destination = origin_city.id, destination_city.id
+
+    # Initialize data structures
+    infinity = float('infinity')
+    cost, previous = [infinity] * len(cities), [None] * len(cities)
+    visited = bytearray(len(cities))
+    cost[origin] = 0
+    heap = [(0, origin)]
+
+    # Main loop
+    while heap:
+        # get unvisited city which costs the least
+        city_cost, city = heappop(heap)
+        if visited[city]:
+            continue
+        visited[city] = 1
+
+        if city == destination:
+            break
+
+        # update neighbours' costs
+        for i in range(offsets[city], offsets[city + 1]):
+            neighbour = neighbours[i]
+            neighbour_new_cost = city_cost + lengths[i]
+            if neighbour_new_cost < cost[neighbour]:
+                cost[neighbour] = neighbour_new_cost
+                previous[neighbour] = city
+                heappush(heap, (neighbour_new_cost, neighbour))
+
+    if cost[destination] == infinity:
+        return [], infinity
+
+    path, city = [], destination
+    while city is not None:
+        path.append(cities[city].name)
+        city = previous[city]
+    path.reverse()
+
+    return path, cost[destination]
+
+
+def shortest_path_dijkstra_bidirectional(map_,
+                                         origin_city_name,
+                                         destination_city_name):
+    '''
+    Find shortest path using bidirectional Dijkstra's algorithm.
+
+    Two searches are run at once, a forward one from origin and a backward one
+    from destination (roads are bidirectional, so both work the same way).
+    Each step advances the search whose next city is cheaper. Whenever a city
+    is reached by both, a path through it is found. The best such path is
+    known to be the shortest as soon as the costs of the next cities of both
+    searches add up to no less than its cost.
+
+    [http://en.wikipedia.org/wiki/Bidirectional_search]
+
+    '''
+    origin_city, destination_city = _safe_cities(map_, origin_city_name,
+                                                 destination_city_name)
+
+    # Initialize data structures (one of each per search)
+    infinity = float('infinity')
+    cost = ({origin_city: 0}, {destination_city: 0})
+    previous_city = ({}, {})
+    unvisited_cities = ([(0, origin_city.id, origin_city)],
+                        [(0, destination_city.id, destination_city)])
+    if origin_city == destination_city:
+        best_cost, meeting_city = 0, origin_city
+    else:
+        best_cost, meeting_city = infinity, None
+
+    # Main loop
+    while unvisited_cities[0] and unvisited_cities[1]:
+        next_cost = (unvisited_cities[0][0][0], unvisited_cities[1][0][0])
+        if next_cost[0] + next_cost[1] >= best_cost:
+            break
+
+        # advance the search whose next city costs the least
+        search = 0 if next_cost[0] <= next_cost[1] else 1
+        search_cost, other_search_cost = cost[search], cost[1 - search]
+        city_cost, _, city = heappop(unvisited_cities[search])
+        if city_cost != search_cost[city]:
+            continue  # stale entry, city has already been visited
+
+        # update neighbours' costs, looking for better meeting points
+        for neighbour_city, length in city.adjacency:
+            neighbour_city_new_cost = city_cost + length
+            if neighbour_city_new_cost < search_cost.get(neighbour_city,
+                                                         infinity):
+                search_cost[neighbour_city] = neighbour_city_new_cost
+                previous_city[search][neighbour_city] = city
+                heappush(unvisited_cities[search], (neighbour_city_new_cost,
+                                                    neighbour_city.id,
+                                                    neighbour_city))
+                path_cost = (neighbour_city_new_cost +
+                             other_search_cost.get(neighbour_city, infinity))
+                if path_cost < best_cost:
+                    best_cost, meeting_city = path_cost, neighbour_city
+
+    if not meeting_city:
+        return [], infinity
+
+    # join path from origin to meeting city and path from there to destination
+    path, city = [], meeting_city
+    while city:
+        path.append(city.name)
+        city = previous_city[0].get(city)
+    path.reverse()
+    city = previous_city[1].get(meeting_city)
+    while city:
+        path.append(city.name)
+        city = previous_city[1].get(city)
+
+    return path, best_cost
+
+
+def shortest_path_delta_stepping(map_,
+                                 origin_city_name, destination_city_name,
+                                 delta=None):
+    '''
+    Find shortest path using delta-stepping algorithm.
+
+    Reached cities are kept in buckets of width delta by cost, and buckets are
+    processed in order. All cities in a bucket are expanded together: first
+    through light roads (not longer than delta), repeatedly, as those can
+    bring more cities into the same bucket, and then once through heavy roads,
+    which can only reach later buckets. Delta defaults to the length of the
+    longest road in the map.
+
+    [Meyer, Sanders: Delta-stepping: a parallelizable shortest path algorithm]
+
+    '''
+    origin_city, destination_city = _safe_cities(map_, origin_city_name,
+                                                 destination_city_name)
+    if delta is None:
+        # any positive value does for maps without roads of nonzero length
+        delta = map_.max_road_length or 1.0
+    elif delta <= 0:
+        raise BiiCodeMapsError('Delta must be positive: %s.' % delta)
+
+    # Initialize data structures (cities not yet in cost are unreached)
+    infinity = float('infinity')
+    cost, previous_city = {origin_city: 0}, {}
+    buckets = {0: set([origin_city])}  # from bucket index to cities
+
+    def relax(city, city_new_cost, previous):
+        city_cost = cost.get(city, infinity)
+        if city_new_cost < city_cost:
+            if city_cost != infinity and int(city_cost // delta) in buckets:
+                buckets[int(city_cost // delta)].discard(city)
+            buckets.setdefault(int(city_new_cost // delta), set()).add(city)
+            cost[city] = city_new_cost
+            previous_city[city] = previous
+
+    # Main loop
+    while buckets:
+        index = min(buckets)
+
+        # cities cheaper than current bucket are settled, maybe destination
+        if cost.get(destination_city, infinity) < index * delta:
+            break
+
+        # expand through light roads until bucket stays empty
+        expanded_cities = []
+        while index in buckets:
+            cities = buckets.pop(index)
+            expanded_cities.extend(cities)
+            for city in cities:
+                for neighbour_city, length in city.adjacency:
+                    if length <= delta:
+                        relax(neighbour_city, cost[city] + length, city)
+
+        # expand through heavy roads
+        for city in expanded_cities:
+            for neighbour_city, length in city.adjacency:
+                if length > delta:
+                    relax(neighbour_city, cost[city] + length, city)
 
     return _results(origin_city, destination_city, previous_city, cost)
 
@@ -125,49 +343,55 @@ def shortest_path_a_star(map_, origin_city_name, destination_city_name):
     [http://en.wikipedia.org/wiki/A*_search_algorithm]
 
     '''
-
-    def euclidean_distance(city_1, city_2):
-        return sqrt((city_1.x - city_2.x) ** 2 + (city_1.y - city_2.y) ** 2)
-
     origin_city, destination_city = _safe_cities(map_, origin_city_name,
                                                  destination_city_name)
 
+    # heuristic is the euclidean distance to destination
+    destination_x, destination_y = destination_city.x, destination_city.y
+
     # Initialize data structures
     closed_set, open_set, previous_city = set(), PriorityQueue(), {}
     cost_from_origin, estimated_total_cost = {}, {}
+    heuristic = {}  # computed when a city is opened, reused on updates
 
     cost_from_origin[origin_city] = 0
+    heuristic[origin_city] = hypot(origin_city.x - destination_x,
+                                   origin_city.y - destination_y)
     estimated_total_cost[origin_city] = (cost_from_origin[origin_city] +
-                                         euclidean_distance(origin_city,
-                                                            destination_city))
+                                         heuristic[origin_city])
     open_set.push(origin_city, priority=estimated_total_cost[origin_city])
 
     # Main loop
     while open_set:
         # get city in open set with minimum estimated cost
         city = open_set.pop()
+        city_cost = cost_from_origin[city]
         closed_set.add(city)
 
         if (city == destination_city):
             break
 
         # update neighbours' costs
-        for road in city.roads:
-            neighbour_city = road.other_end(city)
+        for neighbour_city, length in city.adjacency:
             if neighbour_city in closed_set:
                 continue
-            neighbour_city_new_cost = cost_from_origin[city] + road.length
+            neighbour_city_new_cost = city_cost + length
+            # reached cities that are not closed are exactly the open ones
+            neighbour_city_is_open = neighbour_city in cost_from_origin
 
-            if (neighbour_city not in open_set or
+            if (not neighbour_city_is_open or
                     neighbour_city_new_cost < cost_from_origin[neighbour_city]):
 
+                if not neighbour_city_is_open:
+                    heuristic[neighbour_city] = hypot(
+                        neighbour_city.x - destination_x,
+                        neighbour_city.y - destination_y)
                 cost_from_origin[neighbour_city] = neighbour_city_new_cost
                 estimated_total_cost[neighbour_city] = (
-                    cost_from_origin[neighbour_city]
-                    + euclidean_distance(neighbour_city, destination_city))
+                    neighbour_city_new_cost + heuristic[neighbour_city])
                 previous_city[neighbour_city] = city
 
-                if neighbour_city not in open_set:
+                if not neighbour_city_is_open:
                     open_set.push(neighbour_city,
                                   priority=estimated_total_cost[neighbour_city])
 
@@ -184,47 +408,48 @@ class PriorityQueue(object):
     improve a couple of weak points in heapq (see link below).
 
     [https://docs.python.org/2/library/heapq.html]
-    '''
-    REMOVED = '<removed>'  # marker value for "removed" entries
 
+    Entries are never updated nor removed in place. Pushing a value again just
+    adds a new entry, and the current priority of each value is recorded, so
+    that outdated entries can be recognized and discarded when they come up.
+    '''
     def __init__(self):
-        self.queue = []                   # list of entries arranged in a heap
-        self.entries = {}                 # mapping from values to entries
+        self.queue = []                   # (priority, count, value) heap
+        self.priorities = {}              # current priority of each value
         self.counter = count()  # unique sequence count
 
     def push(self, value, priority=0):
         '''Add a new value or update the priority of an existing value.'''
-        if value in self.entries:
-            self.remove(value)
-        count = next(self.counter)
-        entry = [priority, count, value]
-        self.entries[value] = entry
-        heappush(self.queue, entry)
+        self.priorities[value] = priority
+        heappush(self.queue, (priority, next(self.counter), value))
 
     def remove(self, value):
-        '''Mark an existing value as removed. Raise KeyError if not found.'''
-        entry = self.entries.pop(value)
-        entry[-1] = self.REMOVED
+        '''Remove an existing value. Raise KeyError if not found.'''
+        del self.priorities[value]
 
     def pop(self, ):
         '''Remove and return lowest priority value. Raise KeyError if empty.'''
+        priorities = self.priorities
         while self.queue:
             priority, count, value = heappop(self.queue)
-            if value is not self.REMOVED:
-                del self.entries[value]
+            if value in priorities and priorities[value] == priority:
+                del priorities[value]
                 return value
         raise BiiCodeMapsError('Pop called on empty priority queue.')
 
     def __len__(self):
-        return len(self.entries)
+        return len(self.priorities)
 
     def __contains__(self, value):
-        return value in self.entries
+        return value in self.priorities
 
 
 algorithms = {
     'dij-o': shortest_path_dijkstra_original,
     'dij-pq': shortest_path_dijkstra_priority_queue,
+    'dij-csr': shortest_path_dijkstra_csr,
+    'dij-bi': shortest_path_dijkstra_bidirectional,
+    'delta': shortest_path_delta_stepping,
     'a-star': shortest_path_a_star
 }
 '''A map from names to algorithms.'''
@@ -12,6 +12,9 @@ Options:
                                      * a-star  A*
                                      * dij-o   Dijkstra's original
                                      * dij-pq  Dijkstra with priority queue
+                                     * dij-csr Dijkstra over CSR adjacency
+                                     * dij-bi  Bidirectional Dijkstra
+                                     * delta   Delta-stepping
                                      [default: a-star]
 
     -f <format> --format=<format>    Input data format (bcm or ret).
@@ -43,9 +46,15 @@ Commands:
     help   Show this help.
 '''
 
+from __future__ import print_function
 import sys
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+from multiprocessing import Pool, cpu_count
 from docopt import docopt, DocoptExit
-from version import version
+from biicodemaps import __version__
 from biicodemaps.error import BiiCodeMapsError
 from biicodemaps.builders import formats, builders
 from biicodemaps.routing import algorithms
@@ -58,6 +67,7 @@ class Task(object):
         self.builder = builder
         self.algorithm = None
         self.silent = False
+        self._log_buffer = []
 
     def prepare(self):
         '''Do things that must be done just once per file/stdin.'''
@@ -68,8 +78,15 @@ class Task(object):
             self.log("-- %s" % self.builder.file_name)
 
     def log(self, message):
+        '''Buffer message, to be written out by flush.'''
         if not self.silent:
-            print message
+            self._log_buffer.append(message)
+
+    def flush(self):
+        '''Write out buffered messages at once.'''
+        if self._log_buffer:
+            sys.stdout.write('\n'.join(self._log_buffer) + '\n')
+            self._log_buffer = []
 
     def run(self):
         '''To be redefined by subclasses.'''
@@ -148,10 +165,7 @@ def guess_format(filename):
     return extension if extension in formats else None
 
 
-tasks = []
-
-
-def add_file_task(task, args, filename):
+def add_file_task(task, args, filename, tasks):
     format_ = args['--format'] or guess_format(filename)
     if not format_:
         raise DocoptExit('Unkown file format: %s.' % filename)
@@ -161,7 +175,7 @@ def add_file_task(task, args, filename):
     tasks.append(task(args, builder))
 
 
-def add_stdin_task(task, args):
+def add_stdin_task(task, args, tasks):
     format_ = args['--format']
     builder = builders[(format_, 'stream')](sys.stdin)
     tasks.append(task(args, builder))
@@ -175,32 +189,58 @@ def get_task(args):
 
 
 def show_help():
-    print __doc__.strip('\n')
-
-
-current_task = None
+    print(__doc__.strip('\n'))
 
 
 def do_task(task, algorithm, args):
-    global current_task
-    current_task = task
     task.algorithm = algorithm
     task.run()
+    task.flush()
     time = args['--time']
     if time:
         repeat, number = map(int, args['--time-opts'].split(':'))
         task.silent = True
-        results = timeit.repeat(
-            stmt='current_task.run()',
-            setup='from biicodemaps.tool import current_task',
-            number=number, repeat=repeat)
+        results = timeit.Timer(task.run).repeat(repeat=repeat, number=number)
         print('%0.2f ms per loop in best of %s runs of %s loops'
               % (min(results) * 1000, repeat, number))
         task.silent = False
 
 
+def process_task(task, args):
+    try:
+        task.prepare()
+        if args['--algorithm'] == 'all':
+            for algorithm in algorithms:
+                try:
+                    do_task(task, algorithm, args)
+                except BiiCodeMapsError as e:
+                    task.log(str(e))
+        else:
+            do_task(task, args['--algorithm'], args)
+    except BiiCodeMapsError as e:
+        task.log(str(e))
+    finally:
+        task.flush()
+
+
+def process_task_captured(task_and_args):
+    '''Worker for parallel processing of tasks.
+
+    Returns (output, exit message) so that output of different tasks does not
+    interleave, and usage errors are reported by the parent process.
+    '''
+    stdout, sys.stdout = sys.stdout, StringIO()
+    try:
+        process_task(*task_and_args)
+        return sys.stdout.getvalue(), None
+    except SystemExit as e:
+        return sys.stdout.getvalue(), str(e)
+    finally:
+        sys.stdout = stdout
+
+
 def main():
-    args = docopt(__doc__, version='BiiCodeMaps %s' % version)
+    args = docopt(__doc__, version='BiiCodeMaps %s' % __version__)
 
     if args['help']:
         show_help()
@@ -213,25 +253,28 @@ def main():
     if not task:
         raise DocoptExit('Unknown command.')
 
+    tasks = []
     if args['<file>']:
         for filename in args['<file>']:
-            add_file_task(task, args, filename)
+            add_file_task(task, args, filename, tasks)
     else:
-        add_stdin_task(task, args)
+        add_stdin_task(task, args, tasks)
 
-    for task in tasks:
+    # files are independent, so process them in parallel, unless timing
+    if len(tasks) > 1 and not args['--time']:
+        pool = Pool(min(len(tasks), cpu_count()))
         try:
-            task.prepare()
-            if args['--algorithm'] == 'all':
-                for algorithm in algorithms:
-                    try:
-                        do_task(task, algorithm, args)
-                    except BiiCodeMapsError, e:
-                        print e.message
-            else:
-                do_task(task, args['--algorithm'], args)
-        except BiiCodeMapsError, e:
-            print e.message
+            for output, exit_message in pool.imap(process_task_captured,
+                                                  [(task, args)
+                                                   for task in tasks]):
+                sys.stdout.write(output)
+                if exit_message:
+                    raise SystemExit(exit_message)
+        finally:
+            pool.terminate()
+    else:
+        for task in tasks:
+            process_task(task, args)
 
 
 if __name__ == '__main__':
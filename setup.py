@@ -4,7 +4,7 @@
 import sys
 from setuptools import setup
 from setuptools.command.test import test as TestCommand
-from version import version
+from biicodemaps import __version__
 
 
 class PyTest(TestCommand):
@@ -27,7 +27,7 @@ class PyTest(TestCommand):
 
 
 setup(name='biicodemaps',
-      version=version,
+      version=__version__,
       description='A small utility to deal with map routing problems.',
 
       packages=['biicodemaps'],
@@ -66,3 +66,52 @@ class TestRoadCreation:
         map_with_2_cities.create_road('A', 'B')
         with raises(BiiCodeMapsError):
             map_with_2_cities.create_road('B', 'A')
+
+    def test_works_with_city_objects(self, map_with_2_cities):
+        city_1 = map_with_2_cities.city('A')
+        city_2 = map_with_2_cities.city('B')
+        road = map_with_2_cities.create_road_between(city_1, city_2)
+        assert (road.city_1, road.city_2) == (city_1, city_2)
+        assert road in map_with_2_cities.roads
+        with raises(BiiCodeMapsError):
+            map_with_2_cities.create_road_between(city_2, city_1)
+
+    def test_skips_validation_if_asked(self, map_with_2_cities):
+        city_1 = map_with_2_cities.city('A')
+        city_2 = map_with_2_cities.city('B')
+        map_with_2_cities.create_road_between(city_1, city_2)
+        with raises(BiiCodeMapsError):
+            map_with_2_cities.create_road_between(city_2, city_1)
+        road = map_with_2_cities.create_road_between(city_2, city_1,
+                                                     check=False)
+        assert (road.city_1, road.city_2) == (city_2, city_1)
+        assert len(map_with_2_cities.roads) == 2
+
+
+class TestMaxRoadLength:
+    def test_follows_road_creation(self, map_with_2_cities):
+        assert map_with_2_cities.max_road_length == 0
+        map_with_2_cities.create_city('C', 1, 0)
+        map_with_2_cities.create_road('A', 'C')
+        assert map_with_2_cities.max_road_length == 1
+        map_with_2_cities.create_road('A', 'B')
+        assert map_with_2_cities.max_road_length == 2 ** 0.5
+        map_with_2_cities.create_road('B', 'C')
+        assert map_with_2_cities.max_road_length == 2 ** 0.5
+
+
+class TestCSR:
+    def test_matches_roads(self, map_with_2_cities):
+        map_with_2_cities.create_city('C', 1, 0)
+        map_with_2_cities.create_road('A', 'B')
+        map_with_2_cities.create_road('A', 'C')
+        cities, offsets, neighbours, lengths = map_with_2_cities.csr()
+        assert [city.name for city in cities] == ['A', 'B', 'C']
+        assert offsets == [0, 2, 3, 4]
+        assert neighbours == [1, 2, 0, 0]
+        assert lengths == [2 ** 0.5, 1, 2 ** 0.5, 1]
+
+    def test_is_refreshed_after_changes(self, map_with_2_cities):
+        assert map_with_2_cities.csr()[1] == [0, 0, 0]
+        map_with_2_cities.create_road('A', 'B')
+        assert map_with_2_cities.csr()[1] == [0, 1, 2]
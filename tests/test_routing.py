@@ -1,8 +1,11 @@
 from math import sqrt
-from pytest import fixture, mark
+from pytest import fixture, mark, approx, raises
+from biicodemaps.error import BiiCodeMapsError
 from biicodemaps.model import Map
 from biicodemaps.builders import RETStringMapBuilder
-from biicodemaps.routing import algorithms
+from biicodemaps.routing import (algorithms, PriorityQueue,
+                                 shortest_path_delta_stepping,
+                                 shortest_path_dijkstra_priority_queue)
 
 
 ret_specs = [
@@ -67,3 +70,38 @@ def test_ret_spec_case(algorithm, ret_spec):
     path, cost = algorithm(map_, spec['start'], spec['end'])
     for city_name in path:
         assert city_name in spec['expected']
+
+
+@mark.parametrize('delta', [0.5, 1, 100])
+def test_delta_stepping_with_explicit_delta(delta, trivial_cases_map,
+                                            ret_spec):
+    for map_, origin, destination in [(trivial_cases_map, 'A', 'A'),
+                                      (trivial_cases_map, 'A', 'B'),
+                                      (trivial_cases_map, 'A', 'C'),
+                                      (ret_spec[0], ret_spec[1]['start'],
+                                       ret_spec[1]['end'])]:
+        _, expected_cost = shortest_path_dijkstra_priority_queue(
+            map_, origin, destination)
+        _, cost = shortest_path_delta_stepping(map_, origin, destination,
+                                               delta=delta)
+        assert cost == approx(expected_cost)
+
+
+@mark.parametrize('delta', [0, -1])
+def test_delta_stepping_rejects_non_positive_delta(delta, trivial_cases_map):
+    with raises(BiiCodeMapsError):
+        shortest_path_delta_stepping(trivial_cases_map, 'A', 'B', delta=delta)
+
+
+class TestPriorityQueue:
+    def test_pops_by_updated_priority(self):
+        queue = PriorityQueue()
+        queue.push('A', priority=3)
+        queue.push('B', priority=2)
+        queue.push('C', priority=1)
+        queue.push('A', priority=0)
+        queue.push('C', priority=4)
+        queue.remove('B')
+        assert len(queue) == 2 and 'A' in queue and 'B' not in queue
+        assert [queue.pop(), queue.pop()] == ['A', 'C']
+        assert not queue
@@ -0,0 +1,46 @@
+import os
+import sys
+from pytest import raises
+from biicodemaps import tool
+
+
+def data_file(name):
+    return os.path.join(os.path.dirname(__file__), name)
+
+
+def run_main(monkeypatch, capsys, *argv):
+    '''Run the command line tool with passed arguments, and return its output.
+    '''
+    monkeypatch.setattr(sys, 'argv', ['bcm'] + list(argv))
+    tool.main()
+    return capsys.readouterr()[0]
+
+
+class TestParallelFiles:
+    def test_output_follows_file_order(self, monkeypatch, capsys):
+        files = [data_file('test_1.ret'), data_file('test_2.ret')]
+        expected = ''.join(run_main(monkeypatch, capsys,
+                                    'check', '-a', 'all', file_name)
+                           for file_name in files)
+        output = run_main(monkeypatch, capsys, 'check', '-a', 'all', *files)
+        assert output == expected
+        assert output.index(files[0]) < output.index(files[1])
+
+    def test_exits_after_previous_output_on_usage_error(self, monkeypatch,
+                                                        capsys):
+        expected = run_main(monkeypatch, capsys,
+                            'solve', data_file('test_1.ret'))
+        with raises(SystemExit) as excinfo:
+            run_main(monkeypatch, capsys, 'solve', data_file('test_1.ret'),
+                     data_file('sample_map.bcm'))
+        assert excinfo.value.code not in (None, 0)
+        assert 'Solve only works with ret files.' in str(excinfo.value.code)
+        assert capsys.readouterr()[0].startswith(expected)
+
+
+class TestMain:
+    def test_does_not_rerun_previous_tasks(self, monkeypatch, capsys):
+        file_name = data_file('test_1.ret')
+        for _ in range(2):
+            output = run_main(monkeypatch, capsys, 'check', file_name)
+            assert output.count('-- %s' % file_name) == 1
@@ -1 +0,0 @@
-version = '0.1.0'